@@ -14,6 +14,9 @@ import datetime
 from datetime import timedelta, timezone
 import os
 import zipfile
+import tempfile
+import time
+import weakref
 import pandas as pd
 import smtplib
 import re
@@ -208,6 +211,85 @@ def generate_clean_filename_base(selected_type, base_date):
     _, file_name = generate_names(selected_type, base_date)
     return file_name
 
+REPORT_FILE_PREFIX = "inspection_report_"
+REPORT_TTL_SECONDS = 6 * 60 * 60  # 超過 6 小時的暫存報告視為被遺棄的 session 留下的檔案
+REPORT_MISSING_NOTICE = "報告暫存檔已失效，請回到頁面重新執行「步驟 1：生成報告資料」後再下載。"
+
+def _remove_report_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+@st.cache_resource
+def _live_report_artifacts():
+    # 跨 session、跨 rerun 共用：記錄仍被 session 持有的報告，清理時跳過
+    return weakref.WeakSet()
+
+class ReportArtifact:
+    # 暫存報告檔的持有者：放在 session_state 中，session 結束被回收時自動刪檔
+    def __init__(self, path):
+        self.path = path
+        self._finalizer = weakref.finalize(self, _remove_report_file, path)
+        _live_report_artifacts().add(self)
+
+    def discard(self):
+        self._finalizer()
+
+def sweep_stale_report_artifacts():
+    # 伺服器重啟等 finalizer 來不及執行的情況，靠 TTL 清掉殘留檔 (仍在使用中的不動)
+    tmp_dir = tempfile.gettempdir()
+    cutoff = time.time() - REPORT_TTL_SECONDS
+    live_paths = {report.path for report in list(_live_report_artifacts())}
+    try:
+        names = os.listdir(tmp_dir)
+    except OSError:
+        return
+    for name in names:
+        if not (name.startswith(REPORT_FILE_PREFIX) and name.endswith(".docx")):
+            continue
+        path = os.path.join(tmp_dir, name)
+        if path in live_paths:
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+def save_report_artifact(composer):
+    # 報告只寫入暫存檔一次，session 內只保留持有者，避免每次 rerun 重送整份 bytes
+    sweep_stale_report_artifacts()
+    fd, path = tempfile.mkstemp(prefix=REPORT_FILE_PREFIX, suffix=".docx")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            composer.save(f)
+    except Exception:
+        _remove_report_file(path)
+        raise
+    return ReportArtifact(path)
+
+def read_report_artifact(report):
+    # 檔案可能已被清除 (其他分頁重新生成、清空或暫存目錄清理)，回傳 None 交給呼叫端處理
+    try:
+        with open(report.path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def download_report_data(report):
+    # 檔案不見時直接拋錯，交給 streamlit 的延遲下載錯誤流程，不輸出假的 docx
+    data = read_report_artifact(report)
+    if data is None:
+        raise FileNotFoundError(REPORT_MISSING_NOTICE)
+    return data
+
+def discard_report_artifact():
+    report = st.session_state.get('merged_report')
+    if report is not None:
+        report.discard()
+    st.session_state['merged_report'] = None
+
 def send_email_via_secrets(doc_bytes, filename, receiver_email, receiver_name):
     try:
         sender_email = st.secrets["email"]["account"]
@@ -359,7 +441,7 @@ if 'checks_db' not in st.session_state:
     st.session_state['checks_db'] = load_latest_db()
 
 # Init Variables
-if 'merged_doc_buffer' not in st.session_state: st.session_state['merged_doc_buffer'] = None
+if 'merged_report' not in st.session_state: st.session_state['merged_report'] = None
 if 'merged_filename' not in st.session_state: st.session_state['merged_filename'] = ""
 if 'saved_template' not in st.session_state: st.session_state['saved_template'] = None
 if 'num_groups' not in st.session_state: st.session_state['num_groups'] = 1
@@ -418,7 +500,7 @@ def clear_all_data():
         if key.startswith(('type_', 'item_', 'fname_', 'photos_', 'file_', 'sel_', 'desc_', 'design_', 'result_')):
             del st.session_state[key]
     st.session_state['num_groups'] = 1
-    st.session_state['merged_doc_buffer'] = None
+    discard_report_artifact()
     st.session_state['merged_filename'] = ""
 
 # Sidebar
@@ -631,21 +713,28 @@ if st.session_state['saved_template']:
                             composer = Composer(master_doc)
                         else:
                             composer.append(current_doc)
-                out_buffer = io.BytesIO()
-                composer.save(out_buffer)
-                st.session_state['merged_doc_buffer'] = out_buffer.getvalue()
+                new_report = save_report_artifact(composer)
+                discard_report_artifact()
+                st.session_state['merged_report'] = new_report
                 st.session_state['merged_filename'] = final_file_name
                 st.success(f"✅ 彙整完成！檔名：{final_file_name}")
 
-    if st.session_state['merged_doc_buffer']:
+    merged_report = st.session_state['merged_report']
+    if merged_report is not None:
+        report_available = os.path.exists(merged_report.path)
+        if not report_available: st.warning(f"⚠️ {REPORT_MISSING_NOTICE}")
         col_mail, col_dl = st.columns(2)
         with col_mail:
             if st.button(f"📧 立即寄出 Word 檔給：{selected_name}", use_container_width=True):
                 with st.spinner("📨 雲端發信中..."):
-                    success, msg = send_email_via_secrets(st.session_state['merged_doc_buffer'], st.session_state['merged_filename'], target_email, selected_name)
-                    if success: st.success(msg)
-                    else: st.error(msg)
+                    doc_bytes = read_report_artifact(merged_report)
+                    if doc_bytes is None: st.error(f"❌ {REPORT_MISSING_NOTICE}")
+                    else:
+                        success, msg = send_email_via_secrets(doc_bytes, st.session_state['merged_filename'], target_email, selected_name)
+                        if success: st.success(msg)
+                        else: st.error(msg)
         with col_dl:
-            st.download_button(label="📥 下載 Word 檔案", data=st.session_state['merged_doc_buffer'], file_name=st.session_state['merged_filename'], mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document", use_container_width=True)
+            # data 傳入 callable：只有按下下載時才讀檔串流，rerun 不會重新序列化報告
+            st.download_button(label="📥 下載 Word 檔案", data=lambda: download_report_data(merged_report), file_name=st.session_state['merged_filename'], mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document", on_click="ignore", disabled=not report_available, use_container_width=True)
 else:
     st.info("👈 請先在左側確認 Word 樣板")